@@ -1,61 +1,161 @@
-import pandas as pd
+import csv
+import functools
+import hashlib
 import logging
 import os
 import sys
 import io
 import asyncio
+import time
 import unicodedata
-from typing import Dict, Any, List, Optional, Callable
+import xlsxwriter
+from collections import Counter, deque, OrderedDict
+from operator import itemgetter
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from dataclasses import dataclass, field
 from nicegui import ui, app, run, Client
 from starlette.responses import Response
 from starlette.requests import Request
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s' # Format commun aux logs console et UI.
+# Configuration unique de la console serveur, à l'import du module et non à chaque session.
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, stream=sys.stdout)
 
 
-
-# Ajoute le répertoire 'src' au chemin pour permettre les imports locaux.
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
-
+# Les modules locaux sont importés via le paquet `src` (src/__init__.py), sans modifier sys.path.
 from src.pipeline import get_skills_for_job_streaming
 from src.cache_manager import flush_all_cache
 
 # --- Constantes de configuration ---
 NB_OFFERS_TO_ANALYZE = 100 # Définit le nombre d'offres d'emploi à analyser par défaut.
 
+LOG_FLUSH_INTERVAL_SECONDS = 0.1 # Intervalle de regroupement des logs envoyés à l'élément ui.log.
+EXPORT_COLUMNS = ['classement', 'competence'] # Colonnes écrites dans les fichiers d'export, dans l'ordre.
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# En-têtes de téléchargement construits une seule fois (Starlette les copie et calcule lui-même le Content-Length).
+XLSX_DOWNLOAD_HEADERS = {'Content-Disposition': 'attachment; filename="skillscope_results.xlsx"'}
+CSV_DOWNLOAD_HEADERS = {'Content-Disposition': 'attachment; filename="skillscope_results.csv"'}
+# Options xlsxwriter partagées par tous les exports. Le classeur (au plus TOP_SKILLS_LIMIT lignes) est assemblé en mémoire :
+# 'constant_memory' écrirait des fichiers temporaires sur disque à chaque export, sans gain de mémoire à cette taille.
+XLSX_WORKBOOK_OPTIONS = {'in_memory': True, 'strings_to_numbers': False}
+ASSETS_MAX_CACHE_AGE_SECONDS = 365 * 24 * 60 * 60 # Durée de cache navigateur des fichiers statiques (1 an) : leurs URLs sont versionnées.
+MAX_LOG_MESSAGES = 5000 # Nombre maximum de lignes de log conservées par session (les plus anciennes sont écartées).
+NORMALIZE_CACHE_MAX_TERM_LENGTH = 256 # Au-delà, un terme de recherche est normalisé sans être mémorisé.
+PROGRESS_UPDATE_MIN_INTERVAL_SECONDS = 0.05 # Intervalle minimal entre deux mises à jour intermédiaires de l'UI (20 Hz max).
+EXPORT_STORAGE_MAX_ENTRIES = 1024 # Nombre maximum de sessions dont les résultats restent téléchargeables simultanément.
+EXPORT_STORAGE_TTL_SECONDS = 30 * 60 # Durée pendant laquelle les résultats d'une analyse restent téléchargeables (30 minutes).
+
 # Détermine si l'application est en mode production pour contrôler l'affichage des logs UI.
 IS_PRODUCTION_MODE = os.getenv('PRODUCTION_MODE', 'false').lower() in ('true', '1') # Changé à 'false' par défaut pour le développement
 
 # --- Stockage Global pour l'Export ---
+@dataclass
+class ExportBundle:
+    """
+    Regroupe les données d'export d'une session : elles sont remplacées d'un seul bloc à chaque nouvelle analyse.
+    Les fichiers sérialisés ne sont construits qu'au premier téléchargement, puis réutilisés.
+    """
+    rows: List[Dict[str, Any]]
+    job_title: str
+    offers_count: int
+    xlsx_bytes: Optional[bytes] = None # Contenu Excel mis en cache après la première génération.
+    csv_bytes: Optional[bytes] = None # Contenu CSV mis en cache après la première génération.
+    stored_at: float = field(default_factory=time.monotonic) # Horodatage (monotone) du stockage, pour l'expiration.
+
 # Ce dictionnaire stocke temporairement les données d'export par ID de session client.
-_export_data_storage: Dict[str, Dict[str, Any]] = {}
+# Il est ordonné par date de stockage : les entrées les plus anciennes, expirées ou en surnombre, sont en tête.
+_export_data_storage: 'OrderedDict[str, ExportBundle]' = OrderedDict()
+
+# --- Mutualisation des Recherches Concurrentes ---
+@dataclass
+class SharedSearch:
+    """
+    Analyse en cours pour un métier (normalisé), partagée par toutes les sessions qui l'ont lancée.
+    La première session démarre le pipeline ; les suivantes s'abonnent à sa progression et reçoivent le même résultat.
+    """
+    task: Optional[asyncio.Task] = None
+    progress_callbacks: List[Callable] = field(default_factory=list) # Callbacks de progression des sessions abonnées.
+    latest_results: Optional[Dict[str, Any]] = None # Derniers résultats diffusés, rejoués aux sessions qui arrivent en cours de route.
+    # Nombre d'abonnements par session : une page peut suivre deux fois la même analyse (relance du même terme) et
+    # doit recevoir les logs du pipeline tant qu'il lui en reste un. Les clés sont les destinataires de ces logs.
+    subscriber_client_ids: 'Counter[str]' = field(default_factory=Counter)
+
+# Ce dictionnaire référence les analyses en cours par (terme normalisé, nombre d'offres) : un seul pipeline s'exécute
+# par jeu d'arguments, et une session ne reçoit jamais les résultats d'une analyse portant sur un autre volume d'offres.
+_active_searches: Dict[Tuple[str, int], SharedSearch] = {}
+
+# --- Stockage Global des Logs de Session ---
+# Ce dictionnaire référence l'historique des logs de chaque session client (mode non-production) pour la copie.
+_session_logs_storage: Dict[str, deque] = {}
+# Ce dictionnaire associe à chaque session client (mode non-production) le gestionnaire qui alimente son ui.log.
+_session_ui_log_handlers: Dict[str, 'UiLogHandler'] = {}
+
+# Table de translittération des lettres accentuées du français, construite une fois à partir de la décomposition NFKD
+# (lettre de base, sans l'accent combinant) : le cas courant est traité sans décomposition ni allocation intermédiaire.
+_FRENCH_ACCENTED_LETTERS = 'àâäéèêëîïôöùûüÿç'
+# Caractères sans décomposition Unicode mais courants en français : ligatures (ex: "manœuvre") et apostrophe typographique
+# (ex: "chef d’équipe", saisie par défaut sur mobile), ramenés à leur équivalent ASCII.
+_EXTRA_FOLDING = {'œ': 'oe', 'Œ': 'OE', 'æ': 'ae', 'Æ': 'AE', 'ø': 'o', 'Ø': 'O', '’': "'"}
+_ACCENT_TABLE = str.maketrans({
+    **{letter: unicodedata.normalize('NFKD', letter)[0] for letter in _FRENCH_ACCENTED_LETTERS + _FRENCH_ACCENTED_LETTERS.upper()},
+    **_EXTRA_FOLDING,
+})
 
-# --- Verrouillage des Recherches Concurrentes ---
-# Ce dictionnaire gère les recherches de métiers déjà en cours pour éviter les requêtes redondantes.
-_active_searches: Dict[str, asyncio.Future] = {}
 
 def _normalize_search_term(term: str) -> str:
     """
     Normalise une chaîne de caractères pour une utilisation cohérente comme clé de recherche ou de cache.
-    Cette fonction convertit le terme en minuscules, supprime les accents et les espaces superflus.
+    Les résultats sont mémorisés, sauf pour les termes trop longs : maxsize borne le nombre d'entrées du cache,
+    pas leur taille, et le champ de saisie n'impose aucune longueur maximale.
+    """
+    if len(term) > NORMALIZE_CACHE_MAX_TERM_LENGTH:
+        return _normalize_impl(term)
+    return _normalize_cached(term)
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_cached(term: str) -> str:
+    """
+    Version mémorisée de `_normalize_impl`, réservée aux termes courts : les mêmes métiers reviennent d'une session à l'autre.
+    """
+    return _normalize_impl(term)
+
+
+def _normalize_impl(term: str) -> str:
+    """
+    Convertit le terme en minuscules, supprime les accents et les espaces superflus (sans mémorisation).
     """
-    normalized_term = unicodedata.normalize('NFKD', term) # Normalise les caractères Unicode.
-    normalized_term = normalized_term.encode('ascii', 'ignore').decode('utf-8').lower().strip() # Supprime les accents et met en minuscules.
-    return normalized_term
+    if term.isascii():
+        return term.lower().strip() # Sans accent possible : la décomposition Unicode ne changerait rien.
+    folded_term = term.translate(_ACCENT_TABLE) # Cas courant : seuls des accents français ou des ligatures sont présents.
+    if folded_term.isascii():
+        return folded_term.lower().strip()
+    # Caractères plus rares (autres accents, autres écritures, espaces spéciaux) : décomposition Unicode complète,
+    # sauf si le terme est déjà en NFKD (vérification rapide « Quick Check », sans allocation).
+    if not unicodedata.is_normalized('NFKD', folded_term):
+        folded_term = unicodedata.normalize('NFKD', folded_term)
+    # Seuls les signes diacritiques combinants sont retirés : les lettres sans équivalent ASCII sont conservées.
+    normalized_term = ''.join(char for char in folded_term if not unicodedata.combining(char))
+    return normalized_term.lower().strip()
 
 
 # --- Gestionnaire de Logs pour l'Interface Utilisateur (pour le développeur) ---
+_UI_LOG_FORMATTER = logging.Formatter(LOG_FORMAT) # Construit une seule fois et partagé par tous les UiLogHandler.
+
 class UiLogHandler(logging.Handler):
     """
-    Un gestionnaire de logs personnalisé qui pousse les messages vers un élément `ui.log` de NiceGUI.
+    Un gestionnaire de logs personnalisé qui prépare les messages destinés à un élément `ui.log` de NiceGUI.
+    Les messages sont mis en attente puis poussés par lots (voir `_flush_pending_logs`) pour limiter les trames websocket.
     En mode production, il est désactivé pour l'affichage dans l'UI.
     """
-    def __init__(self, log_element: ui.log, log_messages_list: list):
+    def __init__(self, log_element: ui.log, log_messages_list: deque, pending_messages: list):
         super().__init__()
         self.log_element = log_element
-        self.log_messages_list = log_messages_list
-        # Définit le format des messages de log affichés dans l'UI développeur.
-        self.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
+        self.log_messages_list = log_messages_list # Tampon circulaire borné des derniers messages.
+        self.pending_messages = pending_messages # Messages en attente du prochain envoi groupé vers l'UI.
+        self._errored = False # Signale qu'une erreur a déjà été reportée, pour éviter une avalanche de messages.
+        # Définit le format des messages de log affichés dans l'UI développeur (formateur partagé par toutes les sessions).
+        self.setFormatter(_UI_LOG_FORMATTER)
 
     def emit(self, record):
         """
@@ -65,97 +165,281 @@ class UiLogHandler(logging.Handler):
             msg = self.format(record)
             self.log_messages_list.append(msg)
 
-            # Pousse le log vers l'élément ui.log si en mode non-production et connecté.
-            if not IS_PRODUCTION_MODE and self.log_element and hasattr(self.log_element, 'push') and self.log_element.client.has_socket_connection:
-                self.log_element.push(msg)
+            # Met le log en attente pour l'élément ui.log si en mode non-production.
+            if not IS_PRODUCTION_MODE and self.log_element:
+                self.pending_messages.append(msg)
 
         except Exception as e:
-            print(f"Erreur dans UiLogHandler: {e}")
+            # Signale une seule fois l'erreur sur stderr, sans print() bloquant à chaque enregistrement.
+            if not self._errored:
+                self._errored = True
+                sys.stderr.write(f"Erreur dans UiLogHandler: {e}\n")
+
+
+class SessionLogDispatcher(logging.Handler):
+    """
+    Gestionnaire unique attaché au logger partagé des sessions : il transmet chaque enregistrement au UiLogHandler
+    de la session indiquée par l'attribut `client_id` (ajouté par le LoggerAdapter de la session), ou de chacune
+    des sessions de l'attribut `client_ids` (logs d'une analyse partagée, voir _join_or_start_search).
+    """
+    def emit(self, record):
+        # Copie en tuple : l'ensemble des abonnés d'une analyse partagée peut évoluer pendant l'itération.
+        client_ids = tuple(getattr(record, 'client_ids', None) or (getattr(record, 'client_id', None),))
+        for client_id in client_ids:
+            ui_log_handler = _session_ui_log_handlers.get(client_id)
+            if ui_log_handler is not None:
+                ui_log_handler.handle(record)
+
+
+# Logger unique partagé par toutes les sessions : chaque session l'utilise via un LoggerAdapter portant son client_id,
+# au lieu d'un logger nommé par session qui resterait enregistré à vie dans le module logging.
+_SESSION_LOGGER = logging.getLogger('skillscope.session')
+_SESSION_LOGGER.setLevel(logging.INFO) # Définit le niveau de log à INFO pour un suivi détaillé.
+_SESSION_LOGGER.addHandler(SessionLogDispatcher())
+
+
+def _flush_pending_logs(log_element: ui.log, pending_messages: list):
+    """
+    Pousse en une seule fois les logs en attente vers l'élément ui.log, soit une trame websocket par intervalle.
+    Appelée périodiquement par un `ui.timer` de la page principale.
+    """
+    if not pending_messages or not log_element.client.has_socket_connection:
+        return
+    # Seuls les messages présents au moment de l'envoi sont retirés : un enregistrement émis entre-temps depuis un
+    # thread (ex: run.io_bound) reste en attente pour le lot suivant au lieu d'être effacé sans avoir été affiché.
+    message_count = len(pending_messages)
+    log_element.push("\n".join(pending_messages[:message_count]))
+    del pending_messages[:message_count]
+
+
+# --- Sérialisation des exports (exécutée hors de la boucle d'événements) ---
+def _build_xlsx_bytes(rows: List[Dict[str, Any]], job_title: str, offers_count: int) -> bytes:
+    """
+    Construit le classeur Excel des résultats à partir des lignes natives et retourne son contenu binaire.
+    Cette fonction est bloquante et doit être exécutée dans un thread dédié.
+    """
+    output = io.BytesIO()
+    # Écriture directe avec xlsxwriter depuis les lignes Python : ni DataFrame, ni conversion de scalaires numpy par cellule.
+    workbook = xlsxwriter.Workbook(output, XLSX_WORKBOOK_OPTIONS)
+    worksheet = workbook.add_worksheet('Resultats')
+    worksheet.write_row(0, 0, ['Métier Analysé:', job_title])
+    worksheet.write_row(1, 0, ['Offres Analysées:', offers_count])
+    worksheet.write_row(3, 0, EXPORT_COLUMNS) # La ligne 2 reste vide pour séparer l'en-tête des données.
+    for row_index, row in enumerate(rows, start=4):
+        worksheet.write_row(row_index, 0, [row[column] for column in EXPORT_COLUMNS])
+    workbook.close()
+    return output.getvalue()
+
+
+def _build_csv_bytes(rows: List[Dict[str, Any]], job_title: str, offers_count: int) -> bytes:
+    """
+    Construit le fichier CSV des résultats (précédé d'un en-tête descriptif) et retourne son contenu encodé en UTF-8.
+    Cette fonction est bloquante et doit être exécutée dans un thread dédié.
+    """
+    output = io.BytesIO()
+    # En-tête descriptif écrit directement en octets, suivi d'une ligne vide avant les données.
+    output.write(f"Métier Analysé: {job_title}\nOffres Analysées: {offers_count}\n\n".encode('utf-8'))
+    # Le module csv écrit les lignes natives au fil de l'eau, encodées en UTF-8 dans le même tampon : aucun DataFrame.
+    text_output = io.TextIOWrapper(output, encoding='utf-8', newline='', write_through=True)
+    writer = csv.writer(text_output, lineterminator='\n')
+    writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(map(itemgetter(*EXPORT_COLUMNS), rows))
+    text_output.detach() # Rend la main sur le tampon sans le fermer.
+    return output.getvalue()
+
+
+def _warm_up_export_builders():
+    """
+    Construit une fois chaque export avec une ligne factice au démarrage du serveur, pour que le premier
+    téléchargement réel ne paie pas l'initialisation paresseuse de xlsxwriter (modules internes, styles, zip).
+    """
+    sample_rows = [{'classement': 1, 'competence': 'Warm-up'}]
+    _build_xlsx_bytes(sample_rows, 'Warm-up', 0)
+    _build_csv_bytes(sample_rows, 'Warm-up', 0)
+
+
+app.on_startup(lambda: run.io_bound(_warm_up_export_builders)) # Hors de la boucle d'événements, comme les vrais exports.
+
+
+def _get_export_bundle(client_id: str) -> Optional[ExportBundle]:
+    """
+    Retourne les données d'export d'une session, ou None si elles sont absentes ou expirées.
+    Une entrée expirée est retirée au passage.
+    """
+    export_bundle = _export_data_storage.get(client_id)
+    if export_bundle is not None and time.monotonic() - export_bundle.stored_at > EXPORT_STORAGE_TTL_SECONDS:
+        del _export_data_storage[client_id]
+        return None
+    return export_bundle
 
 
 # --- Points de terminaison (API Endpoints) pour le téléchargement ---
+# La compression gzip des réponses (utile surtout pour le CSV) est assurée par le GZipMiddleware que NiceGUI
+# installe sur son application FastAPI : le XLSX, déjà compressé (zip), n'est pas recompressé ici.
 @app.get('/download/excel/{client_id}')
-def download_excel_endpoint(client_id: str):
+async def download_excel_endpoint(client_id: str):
     """
     Point de terminaison FastAPI pour télécharger les résultats de l'analyse au format Excel.
     L'ID du client est utilisé pour récupérer les données spécifiques à la session utilisateur.
+    La génération du fichier est déléguée à un thread, puis son contenu est réutilisé pour les téléchargements suivants.
     """
-    if client_id not in _export_data_storage:
+    export_bundle = _get_export_bundle(client_id) # Une seule lecture : titre, volume et lignes restent cohérents.
+    if export_bundle is None:
         logging.warning(f"Export Excel demandé pour un client_id inconnu ou expiré: {client_id}")
         return Response("Aucune donnée à exporter ou session expirée.", media_type='text/plain', status_code=404)
 
-    data = _export_data_storage[client_id]
-    df = data.get('df')
-    job_title = data.get('job_title', 'Non précisé')
-    offers_count = data.get('actual_offers_count', 0)
-
-    if df is None or df.empty:
+    if not export_bundle.rows:
         return Response("Aucune donnée à exporter.", media_type='text/plain', status_code=404)
 
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        header_info = pd.DataFrame([
-            ['Métier Analysé:', job_title],
-            ['Offres Analysées:', offers_count],
-            []
-        ])
-        header_info.to_excel(writer, index=False, header=False, sheet_name='Resultats', startrow=0)
-        df[['classement', 'competence']].to_excel(writer, index=False, sheet_name='Resultats', startrow=len(header_info)-1)
+    if export_bundle.xlsx_bytes is None:
+        # Sérialisation exécutée dans un thread, hors de la boucle asyncio, une seule fois par analyse.
+        export_bundle.xlsx_bytes = await run.io_bound(_build_xlsx_bytes, export_bundle.rows, export_bundle.job_title, export_bundle.offers_count)
 
-    headers = {'Content-Disposition': 'attachment; filename="skillscope_results.xlsx"'}
-    return Response(content=output.getvalue(), media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', headers=headers)
+    return Response(content=export_bundle.xlsx_bytes, media_type=XLSX_MEDIA_TYPE, headers=XLSX_DOWNLOAD_HEADERS)
+
+
+@app.get('/logs/{client_id}')
+async def session_logs_endpoint(client_id: str):
+    """
+    Point de terminaison FastAPI retournant l'historique des logs d'une session en texte brut.
+    Utilisé par le bouton « Copier les logs » pour éviter d'injecter les logs dans du JavaScript.
+    """
+    if client_id not in _session_logs_storage:
+        return Response("Aucun log disponible pour cette session.", media_type='text/plain', status_code=404)
+    return Response("\n".join(_session_logs_storage[client_id]), media_type='text/plain')
 
 
 @app.get('/download/csv/{client_id}')
-def download_csv_endpoint(client_id: str):
+async def download_csv_endpoint(client_id: str):
     """
     Point de terminaison FastAPI pour télécharger les résultats de l'analyse au format CSV.
     L'ID du client est utilisé pour récupérer les données spécifiques à la session utilisateur.
+    La génération du fichier est déléguée à un thread, puis son contenu est réutilisé pour les téléchargements suivants.
     """
-    if client_id not in _export_data_storage:
+    export_bundle = _get_export_bundle(client_id) # Une seule lecture : titre, volume et lignes restent cohérents.
+    if export_bundle is None:
         logging.warning(f"Export CSV demandé pour un client_id inconnu ou expiré: {client_id}")
         return Response("Aucune donnée à exporter ou session expirée.", media_type='text/plain', status_code=404)
 
-    data = _export_data_storage[client_id]
-    df = data.get('df')
-    job_title = data.get('job_title', 'Non précisé')
-    offers_count = data.get('actual_offers_count', 0)
-
-    if df is None or df.empty:
+    if not export_bundle.rows:
         return Response("Aucune donnée à exporter.", media_type='text/plain', status_code=404)
 
-    header_lines = [
-        f"Métier Analysé: {job_title}",
-        f"Offres Analysées: {offers_count}",
-        ""
-    ]
-    csv_data = "\n".join(header_lines) + "\n" + df[['classement', 'competence']].to_csv(index=False, encoding='utf-8')
+    if export_bundle.csv_bytes is None:
+        # Sérialisation exécutée dans un thread, hors de la boucle asyncio, une seule fois par analyse.
+        export_bundle.csv_bytes = await run.io_bound(_build_csv_bytes, export_bundle.rows, export_bundle.job_title, export_bundle.offers_count)
 
-    headers = {'Content-Disposition': 'attachment; filename="skillscope_results.csv"'}
-    return Response(content=csv_data.encode('utf-8'), media_type='text/csv', headers=headers)
+    return Response(content=export_bundle.csv_bytes, media_type='text/csv', headers=CSV_DOWNLOAD_HEADERS)
 
 
-def _store_results_for_client_export(client_id: str, results_dict: Dict[str, Any], job_title_original: str):
+async def _broadcast_progress(shared_search: SharedSearch, current_results: Dict[str, Any], final: bool):
     """
-    Stocke les résultats finaux d'une analyse pour permettre leur téléchargement ultérieur.
+    Diffuse les résultats du pipeline à toutes les sessions abonnées à une analyse partagée.
+    Une session en erreur (ex: déconnectée) est désabonnée sans interrompre la diffusion aux autres.
     """
-    skills_data = results_dict.get('skills', [])
-    formatted_skills = [{'classement': i + 1, 'competence': item['skill']} for i, item in enumerate(skills_data)]
-    df = pd.DataFrame(formatted_skills)
+    shared_search.latest_results = current_results
+    for progress_callback in list(shared_search.progress_callbacks):
+        try:
+            await progress_callback(current_results, final)
+        except Exception as e:
+            logging.warning(f"Session désabonnée de l'analyse partagée après une erreur de mise à jour : {e}")
+            if progress_callback in shared_search.progress_callbacks:
+                shared_search.progress_callbacks.remove(progress_callback)
 
-    _export_data_storage[client_id] = {
-        'df': df,
-        'job_title': job_title_original,
-        'actual_offers_count': results_dict.get('actual_offers_count', 0)
-    }
+
+def _join_or_start_search(normalized_job_term: str, offers_to_analyze: int, client_id: str, progress_callback: Callable) -> Tuple[SharedSearch, bool]:
+    """
+    Abonne une session à l'analyse en cours pour ce métier et ce nombre d'offres, ou la démarre si aucune n'existe.
+    Retourne l'analyse partagée et un booléen indiquant si la session vient de la démarrer.
+    """
+    search_key = (normalized_job_term, offers_to_analyze) # Tous les arguments qui déterminent le résultat du pipeline.
+    shared_search = _active_searches.get(search_key)
+    if shared_search is not None:
+        shared_search.progress_callbacks.append(progress_callback)
+        shared_search.subscriber_client_ids[client_id] += 1
+        return shared_search, False
+
+    shared_search = SharedSearch(progress_callbacks=[progress_callback], subscriber_client_ids=Counter({client_id: 1}))
+    _active_searches[search_key] = shared_search
+    # Les logs du pipeline portent le compteur (vivant) des abonnés : chaque session qui suit l'analyse les reçoit,
+    # y compris celles qui la rejoignent en cours de route ou après le départ de la session qui l'a lancée.
+    pipeline_logger = logging.LoggerAdapter(_SESSION_LOGGER, {'client_ids': shared_search.subscriber_client_ids})
+    # La tâche n'appartient à aucune session : la déconnexion de celle qui l'a lancée n'annule pas l'analyse des autres.
+    shared_search.task = asyncio.create_task(get_skills_for_job_streaming(
+        normalized_job_term,
+        offers_to_analyze,
+        pipeline_logger,
+        lambda current_results, final: _broadcast_progress(shared_search, current_results, final)
+    ))
+
+    def release_search(_task: asyncio.Task):
+        # Retire l'analyse terminée, sauf si une nouvelle analyse du même métier l'a déjà remplacée.
+        if _active_searches.get(search_key) is shared_search:
+            del _active_searches[search_key]
+
+    shared_search.task.add_done_callback(release_search)
+    return shared_search, True
+
+
+def _leave_search(shared_search: Optional[SharedSearch], client_id: str, progress_callback: Optional[Callable]):
+    """
+    Désabonne une session d'une analyse partagée. Si plus aucune session ne la suit, l'analyse est annulée
+    pour ne plus consommer d'appels France Travail ni de quota Gemini au profit de personne.
+    Doit être appelée une seule fois par abonnement (voir page_searches dans main_page).
+    """
+    if shared_search is None:
+        return
+    if progress_callback in shared_search.progress_callbacks:
+        shared_search.progress_callbacks.remove(progress_callback)
+    # La session ne cesse de recevoir les logs du pipeline qu'une fois son dernier abonnement retiré.
+    shared_search.subscriber_client_ids[client_id] -= 1
+    if shared_search.subscriber_client_ids[client_id] <= 0:
+        del shared_search.subscriber_client_ids[client_id]
+    if not shared_search.progress_callbacks and shared_search.task is not None and not shared_search.task.done():
+        shared_search.task.cancel() # Le done-callback retire ensuite l'analyse de _active_searches.
+
+
+def _store_results_for_client_export(client_id: str, formatted_skills: List[Dict[str, Any]], results_dict: Dict[str, Any], job_title_original: str):
+    """
+    Stocke les résultats finaux d'une analyse pour permettre leur téléchargement ultérieur.
+    La liste de lignes déjà formatée pour le tableau est réutilisée telle quelle comme source unique des exports.
+    """
+    # Remplacement atomique : un téléchargement concurrent lit soit l'ancien, soit le nouveau lot complet.
+    # L'entrée est retirée puis réinsérée pour passer en fin d'ordre, avec les plus récentes.
+    _export_data_storage.pop(client_id, None)
+    _export_data_storage[client_id] = ExportBundle(
+        rows=formatted_skills,
+        job_title=job_title_original,
+        offers_count=results_dict.get('actual_offers_count', 0)
+    )
+
+    # Borne la mémoire : retire en tête les entrées expirées, puis les plus anciennes au-delà de la capacité.
+    now = time.monotonic()
+    while _export_data_storage:
+        oldest_bundle = next(iter(_export_data_storage.values()))
+        if now - oldest_bundle.stored_at <= EXPORT_STORAGE_TTL_SECONDS and len(_export_data_storage) <= EXPORT_STORAGE_MAX_ENTRIES:
+            break
+        _export_data_storage.popitem(last=False)
 
 # --- Logique d'Affichage et d'Analyse des Compétences ---
 # Cette fonction sera appelée par le pipeline pour les mises à jour intermédiaires
 # et le résultat final.
+def _update_pager(page_info_label: ui.label, pagination_buttons: List[ui.button], page: int, total_pages: int):
+    """
+    Met à jour le libellé de page et l'état des boutons de navigation (premier, précédent, suivant, dernier).
+    Affectations directes, sans liaison : rien n'est interrogé en continu, et NiceGUI n'envoie que les valeurs modifiées.
+    """
+    page_info_label.text = f"{page} sur {total_pages}"
+    pagination_buttons[0].set_enabled(page > 1) # btn_first
+    pagination_buttons[1].set_enabled(page > 1) # btn_prev
+    pagination_buttons[2].set_enabled(page < total_pages) # btn_next
+    pagination_buttons[3].set_enabled(page < total_pages) # btn_last
+
+
 async def _update_ui_with_results(results_dict: Dict[str, Any], job_title_original: str, container: ui.column, loading_label: ui.html, table: ui.table, page_info_label: ui.label, pagination_buttons: List[ui.button], is_final: bool):
     """
     Met à jour l'interface utilisateur avec les résultats de l'analyse,
     soit de manière progressive, soit avec le résultat final.
+    Les labels de synthèse sont référencés par `container` lui-même, sans résolution du contexte UI courant.
     """
     skills_data = results_dict.get('skills', [])
     top_diploma = results_dict.get('top_diploma', 'Non précisé')
@@ -165,12 +449,12 @@ async def _update_ui_with_results(results_dict: Dict[str, Any], job_title_origin
         loading_label.content = f"Analyse en cours pour <strong>'{job_title_original}'</strong> ({actual_offers} offres traitées)..."
         return # Attendre plus de données pour afficher le tableau
 
+    # Lignes du tableau en types Python natifs (int/str) : sérialisées directement en JSON par NiceGUI.
     formatted_skills = [{'classement': i + 1, 'competence': item['skill']} for i, item in enumerate(skills_data)]
-    df = pd.DataFrame(formatted_skills)
 
     # Mise à jour du stockage pour l'exportation SI C'EST LE RÉSULTAT FINAL
     if is_final:
-        _store_results_for_client_export(ui.context.client.id, results_dict, job_title_original)
+        _store_results_for_client_export(container.client.id, formatted_skills, results_dict, job_title_original)
 
 
     # Gestion de l'affichage initial et des mises à jour
@@ -184,58 +468,96 @@ async def _update_ui_with_results(results_dict: Dict[str, Any], job_title_origin
                 # Ajout des éléments de synthèse seulement à la fin ou si c'est la première fois qu'on affiche un tableau
                 if is_final or not hasattr(container, 'synthesis_row'): # Ajout initial de la synthèse
                     with ui.row().classes('w-full items-baseline') as synthesis_row:
-                        ui.label(f"Synthèse pour '{job_title_original}'").classes('text-2xl font-bold text-gray-800').bind_text_from(ui.context.element, 'synthesis_title_text')
-                        ui.label(f"({actual_offers} offres analysées)").classes('text-sm text-gray-500 ml-2').bind_text_from(ui.context.element, 'synthesis_offers_count_text')
+                        ui.label(f"Synthèse pour '{job_title_original}'").classes('text-2xl font-bold text-gray-800')
+                        # Labels conservés sur le conteneur et mis à jour par affectation directe de .text, sans liaison.
+                        container.synthesis_offers_label = ui.label(f"({actual_offers} offres analysées)").classes('text-sm text-gray-500 ml-2')
                     container.synthesis_row = synthesis_row # Marque le conteneur pour ne pas le recréer
-                    ui.context.element.synthesis_title_text = f"Synthèse pour '{job_title_original}'"
-                    ui.context.element.synthesis_offers_count_text = f"({actual_offers} offres analysées)"
+                    container.synthesis_offers_count = actual_offers # Valeur affichée, pour ne reformater le texte que si elle change.
 
                     with ui.row().classes('w-full mt-4 gap-4 flex-wrap items-stretch') as top_stats_row:
                         with ui.card().classes('items-center p-4 w-full sm:flex-1 flex flex-col justify-center min-h-[120px]') as top_skill_card:
                             ui.label('Top Compétence').classes('text-sm text-gray-500')
-                            ui.label().classes('text-2xl font-bold text-center text-blue-600').bind_text_from(ui.context.element, 'top_skill_text')
+                            container.top_skill_label = ui.label().classes('text-2xl font-bold text-center text-blue-600')
                         with ui.card().classes('items-center p-4 w-full sm:flex-1 flex flex-col justify-center min-h-[120px]') as top_diploma_card:
                             ui.label('Niveau Demandé').classes('text-sm text-gray-500')
-                            ui.label().classes('text-2xl font-bold text-blue-600').bind_text_from(ui.context.element, 'top_diploma_text')
+                            container.top_diploma_label = ui.label().classes('text-2xl font-bold text-blue-600')
                     container.top_stats_row = top_stats_row
 
                     ui.label("Classement des compétences").classes('text-xl font-bold mt-8 mb-2').bind_visible_from(table, 'visible')
 
                     with ui.row().classes('w-full justify-center gap-4 mb-2 flex-wrap') as export_buttons_row:
-                        client_id = ui.context.client.id
+                        client_id = container.client.id # Client propriétaire du conteneur, indépendamment du contexte courant.
                         ui.link('Export Excel', f'/download/excel/{client_id}', new_tab=True).classes('no-underline bg-green-600 text-white px-4 py-2 rounded-lg hover:bg-green-700')
                         ui.link('Export CSV', f'/download/csv/{client_id}', new_tab=True).classes('no-underline bg-slate-600 text-white px-4 py-2 rounded-lg hover:bg-slate-700')
                     container.export_buttons_row = export_buttons_row
 
 
         # Mettre à jour les labels de synthèse si elles existent (elles sont déjà créées dans la première passe)
-        if hasattr(ui.context.element, 'synthesis_offers_count_text'):
-            ui.context.element.synthesis_offers_count_text = f"({actual_offers} offres analysées)"
-        if hasattr(ui.context.element, 'top_skill_text') and skills_data:
-            ui.context.element.top_skill_text = formatted_skills[0]['competence']
-        if hasattr(ui.context.element, 'top_diploma_text'):
-            ui.context.element.top_diploma_text = top_diploma
+        # Un seul test suffit : tous les labels de synthèse sont créés ensemble. Un label ne renvoie au navigateur
+        # que les textes modifiés ; seul le texte du nombre d'offres demande un formatage.
+        if hasattr(container, 'synthesis_row'):
+            if container.synthesis_offers_count != actual_offers:
+                container.synthesis_offers_count = actual_offers
+                container.synthesis_offers_label.text = f"({actual_offers} offres analysées)"
+            if skills_data:
+                container.top_skill_label.text = formatted_skills[0]['competence']
+            container.top_diploma_label.text = top_diploma
 
         # Mettre à jour les lignes du tableau
         pagination_state = table.pagination._page_state # Accès direct à l'état de pagination
-        pagination_state['rowsNumber'] = len(df) # Important pour la pagination
+        pagination_state['rowsNumber'] = len(formatted_skills) # Important pour la pagination
 
-        table.rows = df.to_dict('records')
-
-        # Recalculer le total des pages
-        total_pages = max(1, (len(df) - 1) // pagination_state['rowsPerPage'] + 1)
+        # Découper les lignes en pages une seule fois par résultat : un clic de pagination se réduit à un accès par index.
+        rows_per_page = pagination_state['rowsPerPage']
+        table.pages = [formatted_skills[i:i + rows_per_page] for i in range(0, len(formatted_skills), rows_per_page)]
+        total_pages = max(1, len(table.pages))
+        table.total_pages = total_pages
         # S'assurer que la page actuelle ne dépasse pas le nouveau total de pages
         pagination_state['page'] = min(pagination_state['page'], total_pages)
+        # Seule la page visible est envoyée au navigateur, pas l'ensemble du classement à chaque mise à jour progressive.
+        table.rows = table.pages[pagination_state['page'] - 1] if table.pages else []
+
+        _update_pager(page_info_label, pagination_buttons, pagination_state['page'], total_pages)
+
+        # Les setters (rows, content, text, enabled) envoient déjà leurs propres mises à jour ; seul l'état de
+        # pagination, modifié en place, demande un envoi explicite du tableau.
+        table.update()
+
+
+# --- Configuration du HTML Head et Styles CSS Globaux ---
+# Fragment statique enregistré une seule fois pour toutes les pages (shared=True), et non à chaque connexion.
+HEAD_HTML = '''
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <style>
+        body { background-color: #f8fafc !important; }
+        .no-underline { text-decoration: none !important; }
+        .footer-links a {
+            text-decoration: none !important;
+            color: #2474c5;
+            font-weight: bold;
+        }
+        .footer-links a:hover {
+            text-decoration: none !important;
+        }
+    </style>
+'''
+ui.add_head_html(HEAD_HTML, shared=True)
+
+
+# --- Fichiers Statiques ---
+def _versioned_asset_url(filename: str) -> str:
+    """
+    Retourne l'URL d'un fichier de `assets/` suffixée d'une empreinte de son contenu.
+    L'URL change dès que le fichier change, ce qui permet un cache navigateur de longue durée sans contenu périmé.
+    """
+    with open(os.path.join('assets', filename), 'rb') as asset_file:
+        content_hash = hashlib.sha256(asset_file.read()).hexdigest()[:12]
+    return f"/assets/{filename}?v={content_hash}"
 
-        page_info_label.text = f"{pagination_state['page']} sur {total_pages}"
-        # Mettre à jour les états des boutons de pagination
-        pagination_buttons[0].set_enabled(pagination_state['page'] > 1) # btn_first
-        pagination_buttons[1].set_enabled(pagination_state['page'] > 1) # btn_prev
-        pagination_buttons[2].set_enabled(pagination_state['page'] < total_pages) # btn_next
-        pagination_buttons[3].set_enabled(pagination_state['page'] < total_pages) # btn_last
 
-        # Forcer la mise à jour de l'UI
-        await ui.run_javascript('NiceGUI.events.emit("update");', respond=False) # Forcer un refresh
+# Monté une seule fois pour toute l'application, et non à chaque nouvelle session.
+app.add_static_files('/assets', 'assets', max_cache_age=ASSETS_MAX_CACHE_AGE_SECONDS) # Sert les fichiers statiques (ex: logo SkillScope.svg) avec un cache navigateur longue durée.
+LOGO_URL = _versioned_asset_url('SkillScope.svg') # Empreinte calculée une fois au démarrage.
 
 
 @ui.page('/')
@@ -252,45 +574,36 @@ def main_page(client: Client):
     pagination_buttons: List[ui.button] = [] # Pour stocker les boutons de pagination
 
     log_view: ui.log = None
-    all_log_messages: List[str] = []
-
-    # Configure un logger spécifique pour cette session utilisateur afin d'isoler les logs.
-    session_logger = logging.getLogger(f"session_logger_{id(client)}")
-    session_logger.handlers.clear() # S'assure qu'aucun ancien handler n'est attaché.
-    session_logger.setLevel(logging.INFO) # Définit le niveau de log à INFO pour un suivi détaillé.
-
-    # Configure le logger racine pour la propagation des messages vers la console du serveur.
-    root_logger = logging.getLogger()
-    if not root_logger.handlers: # Ajoute un handler de console seulement si aucun n'est déjà présent.
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
-        root_logger.addHandler(console_handler)
-    root_logger.setLevel(logging.INFO) # Définit le niveau minimum de log pour le logger racine.
-
-
-    # --- Configuration du HTML Head et Styles CSS Globaux ---
-    ui.add_head_html('''
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <style>
-            .no-underline { text-decoration: none !important; }
-            .footer-links a {
-                text-decoration: none !important;
-                color: #2474c5;
-                font-weight: bold;
-            }
-            .footer-links a:hover {
-                text-decoration: none !important;
-            }
-        </style>
-    ''')
-    app.add_static_files('/assets', 'assets') # Sert les fichiers statiques (ex: logo SkillScope.svg).
-    ui.query('body').style('background-color: #f8fafc;') # Définit la couleur de fond du corps de la page.
+    all_log_messages: deque = deque(maxlen=MAX_LOG_MESSAGES) # Tampon circulaire : la mémoire reste bornée sur les longues sessions.
+    pending_log_messages: List[str] = [] # Logs en attente d'envoi groupé vers log_view.
+
+    # Isole les logs de cette session : l'adaptateur marque chaque enregistrement du client.id de la session,
+    # ce qui permet au SessionLogDispatcher de les router vers le bon ui.log sans créer de logger par session.
+    session_logger = logging.LoggerAdapter(_SESSION_LOGGER, {'client_id': client.id})
+    client.on_delete(lambda: _export_data_storage.pop(client.id, None)) # Libère les données d'export à la suppression du client.
+    # Analyses partagées suivies par cette page, par callback de progression : le bouton d'analyse reste actif pendant
+    # une analyse, une page peut donc en suivre plusieurs à la fois. Chaque abonnement est retiré une seule fois,
+    # soit par le `finally` de son gestionnaire, soit par leave_all_searches à la suppression du client.
+    page_searches: Dict[Callable, SharedSearch] = {}
+
+    def leave_all_searches():
+        """
+        Désabonne la page de toutes les analyses qu'elle suit encore, à la suppression du client.
+        Chacune est annulée si plus aucune session ne la suit.
+        """
+        while page_searches:
+            progress_callback, shared_search = page_searches.popitem()
+            _leave_search(shared_search, client.id, progress_callback)
+
+    # on_delete et non on_disconnect : une coupure brève (reconnexion dans reconnect_timeout) ne doit pas interrompre l'analyse.
+    client.on_delete(leave_all_searches)
+
 
     # --- En-tête de l'Application ---
     with ui.header(elevated=True).classes('bg-white text-black px-4'):
         with ui.row().classes('w-full items-center justify-center'):
             # Logo ajusté
-            ui.image('/assets/SkillScope.svg').classes('h-auto max-w-full object-contain w-40 md:w-48')
+            ui.image(LOGO_URL).classes('h-auto max-w-full object-contain w-40 md:w-48')
 
 
     # --- Contenu Principal de la Page ---
@@ -351,32 +664,26 @@ def main_page(client: Client):
 
             def update_table_pagination():
                 """Met à jour les lignes du tableau et l'état des boutons de pagination."""
-                # Note: main_table.rows contient déjà les données paginées après la mise à jour via _update_ui_with_results
+                # Note: main_table.pages contient les lignes déjà découpées par page, préparées par _update_ui_with_results.
                 # Cette fonction est appelée par les boutons de pagination.
-                df_full_data = pd.DataFrame(main_table.qtable.rows) # Accéder aux données non paginées via qtable
+                pages = getattr(main_table, 'pages', []) # Pages de dictionnaires déjà formatés.
+                total_pages = getattr(main_table, 'total_pages', 1) # Total calculé avec les lignes, pas à chaque clic.
                 pagination_state = main_table.pagination._page_state
-                total_pages = max(1, (len(df_full_data) - 1) // pagination_state['rowsPerPage'] + 1)
-                start = (pagination_state['page'] - 1) * pagination_state['rowsPerPage']
-                end = start + pagination_state['rowsPerPage']
-
-                # Update table rows based on current pagination
-                main_table.rows = df_full_data.iloc[start:end][['classement', 'competence']].to_dict('records')
-                page_info_label.text = f"{pagination_state['page']} sur {total_pages}"
-                btn_first.set_enabled(pagination_state['page'] > 1)
-                btn_prev.set_enabled(pagination_state['page'] > 1)
-                btn_next.set_enabled(pagination_state['page'] < total_pages)
-                btn_last.set_enabled(pagination_state['page'] < total_pages)
+
+                # Simple accès par index : aucun découpage ni reconstruction de DataFrame à chaque clic.
+                main_table.rows = pages[pagination_state['page'] - 1] if pages else []
+                _update_pager(page_info_label, pagination_buttons, pagination_state['page'], total_pages)
 
             btn_first.on_click(lambda: (main_table.pagination._page_state.update(page=1), update_table_pagination()))
             btn_prev.on_click(lambda: (main_table.pagination._page_state.update(page=max(1, main_table.pagination._page_state['page'] - 1)), update_table_pagination()))
-            btn_next.on_click(lambda: (main_table.pagination._page_state.update(page=min(total_pages, main_table.pagination._page_state['page'] + 1)), update_table_pagination()))
-            btn_last.on_click(lambda: (main_table.pagination._page_state.update(page=total_pages), update_table_pagination()))
+            btn_next.on_click(lambda: (main_table.pagination._page_state.update(page=min(getattr(main_table, 'total_pages', 1), main_table.pagination._page_state['page'] + 1)), update_table_pagination()))
+            btn_last.on_click(lambda: (main_table.pagination._page_state.update(page=getattr(main_table, 'total_pages', 1)), update_table_pagination()))
 
 
         async def handle_analysis_click():
             """
             Gère l'événement de clic sur le bouton d'analyse, lançant le pipeline et affichant les résultats.
-            Cette fonction gère également les recherches concurrentes pour un même terme.
+            Les recherches concurrentes d'un même terme partagent une seule exécution du pipeline.
             """
             original_job_term = job_input.value # Récupère le terme tel qu'entré par l'utilisateur.
             normalized_job_term = _normalize_search_term(original_job_term) # Normalise le terme pour la logique interne et le cache.
@@ -387,18 +694,7 @@ def main_page(client: Client):
                 session_logger.warning("Analyse annulée : aucun métier n'a été entré.")
                 return
 
-            # Vérifie si une recherche pour ce métier (normalisé) est déjà en cours.
-            if normalized_job_term in _active_searches:
-                session_logger.info(f"Recherche pour '{normalized_job_term}' déjà en cours; l'utilisateur patiente.")
-                initial_feedback_container.visible = True
-                loading_label.content = f"Une analyse pour <strong>'{original_job_term}'</strong> est déjà en cours. Veuillez patienter..."
-                return
-
-            # Crée une future pour représenter la recherche en cours et l'ajoute au dictionnaire des recherches actives.
-            search_future = asyncio.Future()
-            _active_searches[normalized_job_term] = search_future
-
-            ui_log_handler_instance = None # Initialisation du handler de log.
+            shared_search: Optional[SharedSearch] = None
 
             try:
                 # Réinitialiser l'affichage
@@ -411,18 +707,34 @@ def main_page(client: Client):
                 for comp in pagination_buttons: # Masquer les boutons de pagination
                     comp.visible = False
 
-                # Attache le handler de log de l'UI (pour les logs techniques du développeur) si en mode non-production.
-                if not IS_PRODUCTION_MODE:
-                    ui_log_handler_instance = UiLogHandler(log_view, all_log_messages)
-                    session_logger.addHandler(ui_log_handler_instance)
-
-                # Exécute le pipeline d'analyse avec le terme normalisé.
-                results = await get_skills_for_job_streaming(
-                    normalized_job_term,
-                    NB_OFFERS_TO_ANALYZE,
-                    session_logger,
-                    lambda current_results, final: _update_ui_with_results(current_results, original_job_term, results_container, loading_label, main_table, page_info_label, pagination_buttons, final)
-                )
+                last_progress_update = 0.0 # Horodatage (monotone) de la dernière mise à jour intermédiaire affichée.
+                final_displayed = False # Indique si cette session a déjà reçu le résultat final.
+
+                async def on_progress(current_results: Dict[str, Any], final: bool):
+                    """
+                    Relaie les résultats du pipeline vers l'UI en limitant la fréquence des mises à jour intermédiaires.
+                    Le résultat final est toujours affiché.
+                    """
+                    nonlocal last_progress_update, final_displayed
+                    now = time.monotonic()
+                    if not final and now - last_progress_update < PROGRESS_UPDATE_MIN_INTERVAL_SECONDS:
+                        return # Les résultats suivants sont cumulatifs : ignorer celui-ci ne perd aucune donnée.
+                    last_progress_update = now
+                    final_displayed = final_displayed or final
+                    await _update_ui_with_results(current_results, original_job_term, results_container, loading_label, main_table, page_info_label, pagination_buttons, final)
+
+                # Exécute le pipeline d'analyse avec le terme normalisé, ou rejoint celui déjà en cours pour ce terme.
+                shared_search, is_leader = _join_or_start_search(normalized_job_term, NB_OFFERS_TO_ANALYZE, client.id, on_progress)
+                page_searches[on_progress] = shared_search
+                if not is_leader:
+                    session_logger.info(f"Recherche pour '{normalized_job_term}' déjà en cours; la session rejoint l'analyse partagée.")
+                    if shared_search.latest_results is not None and not shared_search.task.done():
+                        await on_progress(shared_search.latest_results, False) # Affiche immédiatement l'état courant.
+
+                # shield : l'annulation de cette session (ex: déconnexion) n'annule pas l'analyse des autres sessions.
+                results = await asyncio.shield(shared_search.task)
+                if results is not None and not final_displayed:
+                    await on_progress(results, True) # Session abonnée juste après la dernière diffusion.
 
                 if results is None or not results.get("skills"):
                     session_logger.error("Le pipeline n'a retourné aucun résultat exploitable ou aucune compétence.")
@@ -441,6 +753,18 @@ def main_page(client: Client):
                         comp.visible = True
 
 
+            except asyncio.CancelledError:
+                task = asyncio.current_task()
+                if task is not None and task.cancelling():
+                    # Annulation de ce gestionnaire lui-même (ex: arrêt du serveur) : elle doit se propager.
+                    session_logger.info(f"Analyse pour '{normalized_job_term}' interrompue : gestionnaire annulé.")
+                    raise
+                # Seule l'analyse partagée a été annulée : l'interface est toujours là, on sort de l'état de chargement.
+                session_logger.info(f"Analyse partagée pour '{normalized_job_term}' annulée.")
+                initial_feedback_container.visible = True
+                loading_spinner.visible = False
+                loading_label.content = f"L'analyse pour <strong>'{original_job_term}'</strong> a été interrompue. Veuillez relancer la recherche."
+                return
             except Exception as e:
                 session_logger.critical(f"ERREUR CRITIQUE PENDANT L'ANALYSE : {e}", exc_info=True)
                 results_container.clear()
@@ -448,15 +772,11 @@ def main_page(client: Client):
                 loading_spinner.visible = False
                 loading_label.content = f"Une erreur est survenue lors de l'analyse : {e}"
             finally:
-                # Détache le handler temporaire si il a été créé et attaché.
-                if ui_log_handler_instance is not None and ui_log_handler_instance in session_logger.handlers:
-                    session_logger.removeHandler(ui_log_handler_instance)
-
-                # Marque la Future comme terminée et retire le verrou.
-                if not search_future.done():
-                    search_future.set_result(True)
-                if normalized_job_term in _active_searches:
-                    del _active_searches[normalized_job_term]
+                # Désabonne la session de cette analyse seulement (et l'annule si elle était la dernière à la suivre),
+                # sauf si leave_all_searches s'en est déjà chargé ; l'analyse partagée se retire d'elle-même de
+                # _active_searches une fois terminée.
+                if shared_search is not None and page_searches.pop(on_progress, None) is not None:
+                    _leave_search(shared_search, client.id, on_progress)
 
             session_logger.info("Fin du processus global de l'analyse.")
 
@@ -483,9 +803,16 @@ def main_page(client: Client):
                     log_view = ui.log().classes('w-full h-40 bg-gray-800 text-white font-mono text-xs') # Affiche les logs de session.
                     with ui.row().classes('mt-2 gap-2'):
                         ui.button('Vider tout le cache', on_click=lambda: (flush_all_cache(), ui.notify('Cache vidé avec succès !', color='positive')), color='red-6', icon='o_delete_forever') # Bouton pour vider le cache.
-                        ui.button('Copier les logs', on_click=lambda: ui.run_javascript(f'navigator.clipboard.writeText(`{"\\n".join(all_log_messages)}`)'), icon='o_content_copy') # Bouton pour copier les logs.
-
-                    session_logger.addHandler(UiLogHandler(log_view, all_log_messages)) # Attache le gestionnaire de log personnalisé à ce logger de session.
+                        # Le navigateur récupère les logs via /logs/{client_id} puis les copie : aucun contenu n'est interpolé dans le JavaScript.
+                        ui.button('Copier les logs', on_click=lambda: ui.run_javascript(f"fetch('/logs/{client.id}').then(r => r.text()).then(t => navigator.clipboard.writeText(t))"), icon='o_content_copy') # Bouton pour copier les logs.
+
+                    # Enregistre le gestionnaire de log personnalisé de cette session auprès du dispatcher partagé :
+                    # chaque enregistrement n'est ainsi formaté et affiché qu'une fois, même pendant une analyse.
+                    _session_ui_log_handlers[client.id] = UiLogHandler(log_view, all_log_messages, pending_log_messages)
+                    _session_logs_storage[client.id] = all_log_messages # Expose l'historique à l'endpoint /logs.
+                    # Libère l'historique et le gestionnaire à la suppression du client, pas à une simple coupure.
+                    client.on_delete(lambda: (_session_logs_storage.pop(client.id, None), _session_ui_log_handlers.pop(client.id, None)))
+                    ui.timer(LOG_FLUSH_INTERVAL_SECONDS, lambda: _flush_pending_logs(log_view, pending_log_messages)) # Envoie les logs par lots.
 
 
 if __name__ in {"__main__", "__mp_main__"}:
@@ -2,11 +2,40 @@ import redis
 import json
 import os
 import logging
+import time
+from collections import OrderedDict
 
 # Durée de vie du cache en secondes (30 jours).
 CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+# Cache local (en mémoire du processus) placé devant Redis pour les recherches répétées à court terme.
+LOCAL_CACHE_MAX_ENTRIES = 64 # Nombre maximum de résultats conservés en mémoire (les moins récemment utilisés sont écartés).
+LOCAL_CACHE_TTL_SECONDS = 15 * 60 # Durée de vie d'un résultat en mémoire (15 minutes).
 
 redis_client = None # Variable globale pour stocker l'instance du client Redis.
+_local_cache: 'OrderedDict[str, tuple]' = OrderedDict() # Clé -> (horodatage monotone, résultats), du moins au plus récent.
+
+def _get_local_result(cache_key: str) -> dict | None:
+    """
+    Récupère un résultat depuis le cache local s'il existe et n'a pas expiré, et le marque comme récemment utilisé.
+    """
+    entry = _local_cache.get(cache_key)
+    if entry is None:
+        return None
+    stored_at, results = entry
+    if time.monotonic() - stored_at > LOCAL_CACHE_TTL_SECONDS:
+        del _local_cache[cache_key] # Entrée expirée : retirée au passage.
+        return None
+    _local_cache.move_to_end(cache_key)
+    return results
+
+def _set_local_result(cache_key: str, results: dict):
+    """
+    Ajoute un résultat au cache local, en écartant les entrées les moins récemment utilisées au-delà de la capacité.
+    """
+    _local_cache[cache_key] = (time.monotonic(), results)
+    _local_cache.move_to_end(cache_key)
+    while len(_local_cache) > LOCAL_CACHE_MAX_ENTRIES:
+        _local_cache.popitem(last=False)
 
 def initialize_redis():
     """
@@ -34,13 +63,20 @@ def get_cached_results(cache_key: str) -> dict | None:
     """
     Récupère un résultat depuis le cache Redis en utilisant la clé spécifiée.
     Retourne le dictionnaire des résultats si trouvé, sinon None.
+    Le cache local est consulté en premier : une recherche répétée évite l'aller-retour Redis et le décodage JSON.
     """
+    local_results = _get_local_result(cache_key)
+    if local_results is not None:
+        logging.info(f"Cache HIT (local) for '{cache_key}'.") # Indique que le résultat a été trouvé en mémoire.
+        return local_results
     if redis_client is None: return None # Retourne None si le client Redis n'est pas initialisé.
     try:
         cached_json = redis_client.get(cache_key) # Tente de récupérer la valeur associée à la clé.
         if cached_json:
             logging.info(f"Cache HIT for '{cache_key}'.") # Indique que le résultat a été trouvé dans le cache.
-            return json.loads(cached_json) # Désérialise la chaîne JSON en dictionnaire.
+            results = json.loads(cached_json) # Désérialise la chaîne JSON en dictionnaire.
+            _set_local_result(cache_key, results)
+            return results
         logging.info(f"Cache MISS for '{cache_key}'.") # Indique que le résultat n'a pas été trouvé dans le cache.
         return None
     except Exception as e:
@@ -50,8 +86,9 @@ def get_cached_results(cache_key: str) -> dict | None:
 def add_to_cache(cache_key: str, results: dict):
     """
     Ajoute un dictionnaire de résultats au cache Redis avec une durée d'expiration définie.
-    Les résultats sont sérialisés en JSON avant d'être stockés.
+    Les résultats sont sérialisés en JSON avant d'être stockés, et conservés tels quels dans le cache local.
     """
+    _set_local_result(cache_key, results) # Disponible même sans Redis, pour la durée de vie du cache local.
     if redis_client is None: return # Ne fait rien si le client Redis n'est pas initialisé.
     try:
         value_to_store = json.dumps(results, ensure_ascii=False) # Sérialise le dictionnaire en chaîne JSON.
@@ -62,8 +99,9 @@ def add_to_cache(cache_key: str, results: dict):
 
 def delete_from_cache(cache_key: str):
     """
-    Supprime une entrée spécifique du cache Redis en utilisant la clé fournie.
+    Supprime une entrée spécifique du cache Redis (et du cache local) en utilisant la clé fournie.
     """
+    _local_cache.pop(cache_key, None)
     if redis_client is None: return # Ne fait rien si le client Redis n'est pas initialisé.
     try:
         redis_client.delete(cache_key) # Supprime la clé du cache.
@@ -74,8 +112,9 @@ def delete_from_cache(cache_key: str):
 def flush_all_cache() -> bool:
     """
     Vide complètement toutes les données de la base de données Redis connectée.
-    Cette opération est irréversible et doit être utilisée avec prudence.
+    Cette opération est irréversible et doit être utilisée avec prudence. Le cache local est également vidé.
     """
+    _local_cache.clear()
     if redis_client is None:
         logging.error("Impossible de vider le cache: client Redis non initialisé.") # Alerte si le client n'est pas prêt.
         return False
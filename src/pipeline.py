@@ -1,7 +1,8 @@
 import logging
 import asyncio
 from typing import Dict, Any, List, Optional, Callable
-from collections import defaultdict
+from collections import Counter
+import heapq
 import re
 import unicodedata
 
@@ -19,37 +20,34 @@ def _chunk_list(data: List[Any], chunk_size: int) -> List[List[Any]]:
     """
     return [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
 
-def _aggregate_results(batch_results: List[Optional[Dict]]) -> Dict[str, Any]:
+def _accumulate_batch_result(result_batch: Optional[Dict], skill_frequencies: Counter, education_frequencies: Counter):
     """
-    Agrège et compte les compétences et niveaux d'études extraits des différents lots Gemini.
+    Ajoute aux compteurs cumulés les compétences et niveaux d'études extraits d'un lot Gemini.
     Cette fonction suppose que Gemini a déjà effectué la normalisation des compétences.
     Elle gère la déduplication au sein de chaque description avant le comptage global.
     """
-    skill_frequencies = defaultdict(int)
-    education_frequencies = defaultdict(int)
-
-    for result_batch in filter(None, batch_results):
-        if 'extracted_data' in result_batch:
-            for data_entry in result_batch['extracted_data']:
-                # Utilise un ensemble pour dédupliquer les compétences au sein d'une même description
-                # Gemini est censé nous donner des compétences déjà normalisées.
-                processed_skills_for_this_description = set()
-
-                for skill_raw in data_entry.get('skills', []):
-                    skill_stripped = skill_raw.strip()
-                    if skill_stripped:
-                        processed_skills_for_this_description.add(skill_stripped)
-
-                for skill in processed_skills_for_this_description:
-                    skill_frequencies[skill] += 1
+    if not result_batch or 'extracted_data' not in result_batch:
+        return
+
+    for data_entry in result_batch['extracted_data']:
+        # Utilise un ensemble pour dédupliquer les compétences au sein d'une même description
+        # Gemini est censé nous donner des compétences déjà normalisées.
+        processed_skills_for_this_description = {
+            skill_stripped for skill_stripped in (skill_raw.strip() for skill_raw in data_entry.get('skills', [])) if skill_stripped
+        }
+        skill_frequencies.update(processed_skills_for_this_description) # Comptage en une passe, effectué en C par Counter.
 
-                education_level = data_entry.get('education_level', 'Non spécifié')
-                if education_level and education_level != "Non spécifié":
-                    education_frequencies[education_level] += 1
+        education_level = data_entry.get('education_level', 'Non spécifié')
+        if education_level and education_level != "Non spécifié":
+            education_frequencies[education_level] += 1
 
-    # Trie les compétences par fréquence d'apparition.
-    sorted_skills = sorted(skill_frequencies.items(), key=lambda item: item[1], reverse=True)
-    top_skills = [{"skill": skill, "frequency": freq} for skill, freq in sorted_skills[:TOP_SKILLS_LIMIT]]
+def _summarize_frequencies(skill_frequencies: Counter, education_frequencies: Counter) -> Dict[str, Any]:
+    """
+    Construit le classement des compétences et le niveau d'études le plus demandé à partir des compteurs cumulés.
+    """
+    # Sélectionne les compétences les plus fréquentes sans trier l'ensemble des compétences (même ordre que sorted()).
+    top_sorted_skills = heapq.nlargest(TOP_SKILLS_LIMIT, skill_frequencies.items(), key=lambda item: item[1])
+    top_skills = [{"skill": skill, "frequency": freq} for skill, freq in top_sorted_skills]
 
     # Détermine le niveau d'études le plus fréquemment demandé.
     top_education = max(education_frequencies, key=education_frequencies.get) if education_frequencies else "Non précisé"
@@ -110,26 +108,31 @@ async def get_skills_for_job_streaming(
         description_chunks = _chunk_list(descriptions, GEMINI_BATCH_SIZE)
         logger.info(f"Division des descriptions en {len(description_chunks)} lots pour analyse séquentielle.")
 
-        all_batch_results = []
+        # Compteurs cumulés mis à jour lot par lot : chaque lot n'est compté qu'une fois,
+        # au lieu de recompter tous les lots précédents à chaque mise à jour progressive.
+        skill_frequencies = Counter()
+        education_frequencies = Counter()
+        successful_batches_count = 0
+        aggregated_data = _summarize_frequencies(skill_frequencies, education_frequencies) # Agrégat vide tant qu'aucun lot n'a abouti.
         # Exécute les appels à Gemini séquentiellement pour permettre un traitement progressif
         # et bénéficier de la persistance de la session de chat.
         for i, chunk in enumerate(description_chunks):
             logger.info(f"Traitement du lot {i+1}/{len(description_chunks)} pour '{job_title}'...")
             batch_result = await extract_skills_with_gemini(job_title, chunk, logger) # job_title est utilisé comme clé de session
             if batch_result:
-                all_batch_results.append(batch_result)
+                successful_batches_count += 1
                 # Agrège les résultats après chaque lot pour une mise à jour progressive
-                current_aggregated_data = _aggregate_results(all_batch_results)
+                _accumulate_batch_result(batch_result, skill_frequencies, education_frequencies)
+                aggregated_data = _summarize_frequencies(skill_frequencies, education_frequencies)
                 if progress_callback:
                     await progress_callback({
-                        "skills": current_aggregated_data["skills"],
-                        "top_diploma": current_aggregated_data["top_diploma"],
+                        "skills": aggregated_data["skills"],
+                        "top_diploma": aggregated_data["top_diploma"],
                         "actual_offers_count": all_offers_count # Utiliser le nombre total d'offres
                     }, False) # Indiquer que ce ne sont pas les résultats finaux.
 
-
-        logger.info("Fusion et comptage des résultats de tous les lots Gemini...")
-        aggregated_data = _aggregate_results(all_batch_results)
+        # Le dernier agrégat progressif couvre déjà tous les lots : il est réutilisé tel quel comme résultat final.
+        logger.info(f"Fusion et comptage des résultats de tous les lots Gemini terminés ({successful_batches_count} lots exploitables).")
 
         if not aggregated_data.get("skills"):
             logger.error("L'analyse n'a produit aucune compétence; fin du processus.")